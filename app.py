@@ -1,64 +1,118 @@
+import os
+import numpy as np
 import pandas as pd
 import streamlit as st
-import altair as alt
-from datetime import date, timedelta
+
+PARQUET_PATH = "data/primavera.parquet"
+CSV_PATH = "data/primavera.csv"
+TABLE_PAGE_SIZE = 500
+REQUIRED_COLS = ["major_group","package_code","work_type","activity_id","activity_name","start","finish"]
 
 st.set_page_config(page_title="Primavera Planning Dashboard", layout="wide")
 st.title("Primavera Planning Dashboard (Instant)")
-st.caption("Planning dashboard. Data source = extracted CSV committed by GitHub Actions.")
-
-# ---- Load CSV safely ----
+st.caption("Planning dashboard. Data source = extracted Parquet/CSV committed by GitHub Actions.")
+
+@st.cache_data(show_spinner=False)
+def load_df(path, mtime):
+    """
+    Read + clean the extracted data once per file version.
+    `mtime` is only part of the cache key, so a newly committed extract is picked up on the next rerun.
+    """
+    df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    if any(c not in df.columns for c in REQUIRED_COLS):
+        return df
+
+    # Keep start/finish as datetime64 (vectorized compares); Parquet already stores them that way,
+    # only the CSV fallback needs string parsing
+    for c in ("start", "finish"):
+        if not pd.api.types.is_datetime64_any_dtype(df[c]):
+            df[c] = pd.to_datetime(df[c], errors="coerce")
+
+    # Drop rows with invalid dates and enforce start <= finish
+    df = df.dropna(subset=["start", "finish"])
+    df = df[df["start"] <= df["finish"]].copy()
+
+    # Low-cardinality filter/groupby keys: categorical codes make equality and groupby int compares
+    for c in ("major_group", "package_code", "work_type"):
+        df[c] = df[c].astype(str).where(df[c].notna()).astype("category")
+    return df
+
+@st.cache_data(show_spinner=False)
+def filter_options(path, mtime):
+    """Sorted sidebar choices for (major_group, package_code, work_type)."""
+    df = load_df(path, mtime)
+    # Categories are already the sorted unique non-null values
+    return tuple(["(All)"] + df[c].cat.categories.tolist() for c in ("major_group", "package_code", "work_type"))
+
+def apply_filters(df, major, pkg, wt, d1=None, d2=None):
+    """
+    Rows matching the sidebar selection, built as one combined mask (single allocation
+    instead of successive slices). d1/d2 keep activities overlapping that date window.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    if major != "(All)":
+        mask &= df["major_group"].values == major
+    if pkg != "(All)":
+        mask &= df["package_code"].values == pkg
+    if wt != "(All)":
+        mask &= df["work_type"].values == wt
+    if d1 is not None and d2 is not None:
+        mask &= (df["start"].values <= pd.Timestamp(d2)) & (df["finish"].values >= pd.Timestamp(d1))
+    return df.loc[mask]
+
+@st.cache_data(show_spinner=False)
+def filtered_csv(path, mtime, major, pkg, wt, d1=None, d2=None):
+    """CSV bytes for the download button, cached per data version + filter selection."""
+    return apply_filters(load_df(path, mtime), major, pkg, wt, d1, d2).to_csv(index=False).encode("utf-8")
+
+def bar_spec(cat_col, cat_title, horizontal=False):
+    """
+    Plain Vega-Lite spec for a count bar chart over (cat_col, size).
+    Built as a dict instead of through Altair's schema classes; the data itself is passed
+    separately to st.vega_lite_chart, which ships it as Arrow.
+    """
+    cat_ch, size_ch = ("y", "x") if horizontal else ("x", "y")
+    return {
+        "mark": "bar",
+        "height": 320,
+        "encoding": {
+            cat_ch: {"field": cat_col, "type": "nominal", "sort": f"-{size_ch}", "title": cat_title},
+            size_ch: {"field": "size", "type": "quantitative", "title": "Count"},
+            "tooltip": [{"field": cat_col, "type": "nominal"}, {"field": "size", "type": "quantitative"}],
+        },
+    }
+
+# ---- Load data safely (Parquet preferred, CSV fallback for older extracts) ----
+data_path = PARQUET_PATH if os.path.exists(PARQUET_PATH) else CSV_PATH
 try:
-    df = pd.read_csv("data/primavera.csv")
+    mtime = os.path.getmtime(data_path)
+    df = load_df(data_path, mtime)
 except Exception as e:
-    st.error("Could not read data/primavera.csv. Make sure GitHub Actions created it and committed it.")
+    st.error(f"Could not read {data_path}. Make sure GitHub Actions created it and committed it.")
     st.stop()
 
 # Ensure expected columns exist
-required_cols = ["major_group","package_code","work_type","activity_id","activity_name","start","finish"]
-missing = [c for c in required_cols if c not in df.columns]
+missing = [c for c in REQUIRED_COLS if c not in df.columns]
 if missing:
-    st.error(f"CSV is missing required columns: {missing}. Re-run the GitHub Actions extractor.")
-    st.stop()
-
-# Parse dates robustly
-df["start"] = pd.to_datetime(df["start"], errors="coerce").dt.date
-df["finish"] = pd.to_datetime(df["finish"], errors="coerce").dt.date
-
-# Drop rows with invalid dates
-df = df.dropna(subset=["start", "finish"]).copy()
-
-if df.empty:
-    st.warning("No valid rows found in CSV (start/finish dates are missing). Re-run extractor and check PDF text extraction.")
+    st.error(f"{data_path} is missing required columns: {missing}. Re-run the GitHub Actions extractor.")
     st.stop()
 
-# Enforce start <= finish
-df = df[df["start"] <= df["finish"]].copy()
 if df.empty:
-    st.warning("All rows have start > finish after cleaning. Check the PDF extraction output.")
+    st.warning(f"No valid rows found in {data_path} (start/finish dates are missing or start > finish). Re-run extractor and check PDF text extraction.")
     st.stop()
 
 # Sidebar filters
 st.sidebar.header("Filters")
 
-major_options = ["(All)"] + sorted(df["major_group"].dropna().astype(str).unique().tolist())
-major = st.sidebar.selectbox("Major Group", major_options, index=0)
+major_options, pkg_options, wt_options = filter_options(data_path, mtime)
 
-pkg_options = ["(All)"] + sorted(df["package_code"].dropna().astype(str).unique().tolist())
+major = st.sidebar.selectbox("Major Group", major_options, index=0)
 pkg = st.sidebar.selectbox("Area / Package", pkg_options, index=0)
-
-wt_options = ["(All)"] + sorted(df["work_type"].dropna().astype(str).unique().tolist())
 wt = st.sidebar.selectbox("Work Type", wt_options, index=0)
 
-# Safe date range defaults
-min_d = df["start"].min()
-max_d = df["finish"].max()
-
-# If something still odd, fallback to a sane window
-if not isinstance(min_d, date) or not isinstance(max_d, date):
-    today = date.today()
-    min_d = today - timedelta(days=30)
-    max_d = today + timedelta(days=365)
+# Date range defaults (df is non-empty with valid start/finish here, so these are real dates)
+min_d = df["start"].min().date()
+max_d = df["finish"].max().date()
 
 if min_d > max_d:
     min_d, max_d = max_d, min_d
@@ -70,25 +124,19 @@ d_range = st.sidebar.date_input(
     max_value=max_d,
 )
 
-# Apply filters
-f = df.copy()
-if major != "(All)":
-    f = f[f["major_group"].astype(str) == major]
-if pkg != "(All)":
-    f = f[f["package_code"].astype(str) == pkg]
-if wt != "(All)":
-    f = f[f["work_type"].astype(str) == wt]
-
-# Apply date overlap filter
+# Apply filters (date range only once both ends are picked)
 if isinstance(d_range, (tuple, list)) and len(d_range) == 2:
     d1, d2 = d_range[0], d_range[1]
-    f = f[(f["start"] <= d2) & (f["finish"] >= d1)]
+else:
+    d1 = d2 = None
+filters = (major, pkg, wt, d1, d2)
+f = apply_filters(df, *filters)
 
 # KPIs
 c1, c2, c3, c4 = st.columns(4)
 c1.metric("Activities", int(len(f)))
-c2.metric("Earliest start", str(f["start"].min()) if not f.empty else "-")
-c3.metric("Latest finish", str(f["finish"].max()) if not f.empty else "-")
+c2.metric("Earliest start", str(f["start"].min().date()) if not f.empty else "-")
+c3.metric("Latest finish", str(f["finish"].max().date()) if not f.empty else "-")
 if "is_milestone" in f.columns:
     c4.metric("Milestones", int(pd.to_numeric(f["is_milestone"], errors="coerce").fillna(0).sum()))
 else:
@@ -104,37 +152,38 @@ with left:
     if f.empty:
         st.info("No data for current filters.")
     else:
-        by_pkg = f.groupby("package_code", as_index=False).size().sort_values("size", ascending=False)
-        st.altair_chart(
-            alt.Chart(by_pkg).mark_bar().encode(
-                x=alt.X("package_code:N", sort="-y", title="Package"),
-                y=alt.Y("size:Q", title="Count"),
-                tooltip=["package_code", "size"],
-            ).properties(height=320),
-            use_container_width=True
-        )
+        # value_counts is a single counting pass and comes back sorted; categoricals also report
+        # zero counts for unused categories, so drop those
+        counts = f["package_code"].value_counts()
+        by_pkg = counts[counts > 0].rename_axis("package_code").reset_index(name="size")
+        st.vega_lite_chart(by_pkg, bar_spec("package_code", "Package"), use_container_width=True)
 
 with right:
     st.subheader("Work Type distribution")
     if f.empty:
         st.info("No data for current filters.")
     else:
-        by_wt = f.groupby("work_type", as_index=False).size().sort_values("size", ascending=False)
-        st.altair_chart(
-            alt.Chart(by_wt).mark_bar().encode(
-                y=alt.Y("work_type:N", sort="-x", title="Work Type"),
-                x=alt.X("size:Q", title="Count"),
-                tooltip=["work_type", "size"],
-            ).properties(height=320),
-            use_container_width=True
-        )
+        counts = f["work_type"].value_counts()
+        by_wt = counts[counts > 0].rename_axis("work_type").reset_index(name="size")
+        st.vega_lite_chart(by_wt, bar_spec("work_type", "Work Type", horizontal=True), use_container_width=True)
 
 st.subheader("Schedule table")
-st.dataframe(f, use_container_width=True, height=460)
+# Only the current page is serialized to the browser; the download below still has every row
+n_pages = max(1, (len(f) + TABLE_PAGE_SIZE - 1) // TABLE_PAGE_SIZE)
+page = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1, step=1) if n_pages > 1 else 1
+st.dataframe(
+    f.iloc[(page - 1) * TABLE_PAGE_SIZE : page * TABLE_PAGE_SIZE],
+    use_container_width=True,
+    height=460,
+    column_config={
+        "start": st.column_config.DatetimeColumn(format="YYYY-MM-DD"),
+        "finish": st.column_config.DatetimeColumn(format="YYYY-MM-DD"),
+    },
+)
 
 st.download_button(
     "Download filtered CSV",
-    data=f.to_csv(index=False).encode("utf-8"),
+    data=filtered_csv(data_path, mtime, *filters),
     file_name="primavera_planning_filtered.csv",
     mime="text/csv",
 )
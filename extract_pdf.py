@@ -1,16 +1,30 @@
+import hashlib
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from functools import lru_cache
 from pathlib import Path
-from dateutil.parser import parse as dtparse
+import numpy as np
 import pandas as pd
 import fitz  # PyMuPDF
 
 # Unicode hyphens inside tokens
 HYPHEN_CLASS = r"[-\u2010\u2011\u2012\u2013\u2014\u2212\uFE63\uFF0D]"
-FULL_DATE_RE = re.compile(rf"^\s*(\d{{4}}){HYPHEN_CLASS}(\d{{2}}){HYPHEN_CLASS}(\d{{2}})\*?\s*$")
+# Per-character token cleanup in one str.translate: drop zero-width space / BOM, NBSP -> space,
+# Unicode hyphens -> "-"
+TOKEN_TRANS = str.maketrans(
+    {"\u200b": None, "\ufeff": None, "\xa0": " "}
+    | dict.fromkeys("\u2010\u2011\u2012\u2013\u2014\u2212\uFE63\uFF0D", "-")
+)
+# A whole token that is a full date once its "*" marks are dropped (wherever they sit);
+# multiline so one finditer scans a newline-joined row of tokens
+FULL_DATE_RE = re.compile(rf"^[^\S\n]*(\d{{4}}){HYPHEN_CLASS}(\d{{2}}){HYPHEN_CLASS}(\d{{2}})[^\S\n]*$", re.MULTILINE)
 
 ACT_ID_RE = re.compile(r"^[A-Z]{1,6}\d{2,7}$", re.IGNORECASE)
 PKG_RE = re.compile(r"^[A-Z]\d{2,3}$", re.IGNORECASE)
 
+# (label, pattern) matched against the lowercased activity name; first rule in list order wins
 WORKTYPE_RULES = [
     ("Pile diagram", r"\bpile\s+diagram\b"),
     ("Issue pile drawing", r"\bissue\s+pile\s+drawing\b"),
@@ -24,269 +38,423 @@ WORKTYPE_RULES = [
     ("Shipping", r"\bshipping\b"),
 ]
 
+# All rules fused into one regex, one search per name. Each alternative is a lookahead over the
+# whole name, so alternatives are tried in rule order (not by leftmost position in the name).
+WORKTYPE_RE = re.compile(
+    "^(?:" + "|".join(rf"(?=.*?(?P<wt{i}>{pat}))" for i, (_, pat) in enumerate(WORKTYPE_RULES)) + ")",
+    re.DOTALL,
+)
+WORKTYPE_LABELS = {f"wt{i}": label for i, (label, _) in enumerate(WORKTYPE_RULES)}
+# Every rule contains one of these literal words, so a name without any of them cannot match
+WORKTYPE_KEYWORDS = ("diagram", "drawing", "layout", "bidding", "manufacturing", "shipping")
+
+# Rows whose first token (lowercase) is one of these are timescale/page headers, not activities
+HEADER_FIRST_TOKENS = frozenset({"month", "page"})
+
+# Date row -> id row matching (points): rows closer than OFFSET_LEARN_MAX feed the per-page
+# offset estimate; after the offset correction a date row joins an id row up to Y_JOIN_MAX away
+OFFSET_LEARN_MAX = 20.0
+Y_JOIN_MAX = 25.0
+
+# Line prefix (lowercase) -> major group label
+MAJOR_GROUP_PREFIXES = {
+    "detailed en": "Detailed Engineering Design",
+    "procurement": "Procurement",
+    "employer revi": "Employer Review and Approval",
+    "main mile": "Main Milestones",
+}
+# One multiline scan over a page's (already lowercased) line heads finds every heading; the last
+# match wins. Case is folded with str.lower() rather than re.IGNORECASE, whose Unicode folding
+# also matches e.g. "İ"/"ı" and would yield groups that are not MAJOR_GROUP_PREFIXES keys.
+HEADING_RE = re.compile("^(" + "|".join(re.escape(p) for p in MAJOR_GROUP_PREFIXES) + ")", re.MULTILINE)
+
+@lru_cache(maxsize=65536)
 def normalize_token(t: str) -> str:
+    # Schedule tokens repeat heavily (ids, dates, common words), hence the cache
     t = (t or "").strip()
-    t = t.replace("\u200b", "").replace("\ufeff", "").replace("\xa0", " ")
-    # normalize unicode hyphens to "-"
-    t = re.sub(HYPHEN_CLASS, "-", t)
-    return t
-
-def looks_like_activity_id(tok: str) -> bool:
-    tok = normalize_token(tok)
-    return bool(ACT_ID_RE.match(tok))
+    if t.isascii():
+        # no zero-width chars, NBSP or Unicode hyphens to fold
+        return t
+    t = t.translate(TOKEN_TRANS)
+    # strip again: removing a leading zero-width char can expose NBSP-turned-space, and a
+    # second normalize_token pass must be a no-op so downstream code can trust the tokens
+    return t.strip()
+
+def _is_act_id(t: str) -> bool:
+    """Activity-id shape test for an already normalized token."""
+    # Cheap shape check (3-13 chars, leading letter) rejects most tokens before the regex
+    return 3 <= len(t) <= 13 and t[0].isalpha() and ACT_ID_RE.match(t) is not None
 
 def is_package_code(tok: str) -> bool:
     tok = normalize_token(tok)
-    return bool(PKG_RE.match(tok))
+    return 3 <= len(tok) <= 4 and tok[0].isalpha() and PKG_RE.match(tok) is not None
 
 def infer_work_type(name: str) -> str:
     s = (name or "").lower()
-    for label, pat in WORKTYPE_RULES:
-        if re.search(pat, s):
-            return label
-    if (name or "").upper().startswith("MS"):
+    # Plain substring pre-check: most names contain none of the rule keywords and skip the regex
+    if any(k in s for k in WORKTYPE_KEYWORDS):
+        m = WORKTYPE_RE.match(s)
+        if m:
+            return WORKTYPE_LABELS[m.lastgroup]
+    if (name or "")[:2].upper().startswith("MS"):
         return "Milestone"
     return "Other"
 
+# Schedules reuse the same handful of dates across many rows
+@lru_cache(maxsize=4096)
 def parse_iso(iso: str):
-    return dtparse(iso).date()
+    # iso is always "YYYY-MM-DD" (rebuilt from FULL_DATE_RE groups): the C-level ISO parser
+    # handles exactly that, no format sniffing needed
+    return date.fromisoformat(iso)
 
 def extract_full_dates_from_tokens(tokens):
     """
     Return list of found full-date tokens in order.
     Each item: {"iso": "YYYY-MM-DD", "star": bool}
+    Tokens are expected to be normalized already (build_fragments does that). A row without any
+    "*" is scanned with one regex pass instead of a Python loop per token.
     """
+    text = "\n".join(tokens)
+    if "*" not in text:
+        return [{"iso": f"{m.group(1)}-{m.group(2)}-{m.group(3)}", "star": False} for m in FULL_DATE_RE.finditer(text)]
+    # Starred row: every "*" is dropped before matching, but only a trailing one flags the date,
+    # so match token by token to keep each flag with its date
     out = []
     for tok in tokens:
-        raw = (tok or "").strip()
-        star = raw.endswith("*")
-        norm = normalize_token(raw).replace("*", "")
-        m = FULL_DATE_RE.match(norm)
+        m = FULL_DATE_RE.match(tok.replace("*", ""))
         if m:
-            out.append({"iso": f"{m.group(1)}-{m.group(2)}-{m.group(3)}", "star": star})
+            out.append({"iso": f"{m.group(1)}-{m.group(2)}-{m.group(3)}", "star": tok.endswith("*")})
     return out
 
+# Per-fragment geometry, kept as one structured array (tokens live in a parallel list)
+FRAG_DTYPE = np.dtype([("x0", "f8"), ("ymid", "f8")])
+
 def build_fragments(words):
     """
     Build line fragments by (block_no,line_no) and keep their y-mid for clustering.
+    Returns (geom, tokens): geom is a FRAG_DTYPE array with one record per fragment and
+    tokens[i] holds fragment i's tokens ordered by x0.
+    """
+    # PyMuPDF words mode already yields str for the text slot
+    toks = [normalize_token(w[4]) for w in words]
+    keep = [i for i, t in enumerate(toks) if t]
+    if not keep:
+        return np.empty(0, dtype=FRAG_DTYPE), []
+
+    # (x0, y0, y1, block_no, line_no) per kept word, as one float array
+    arr = np.array([(w[0], w[1], w[3], w[5], w[6]) for w in words], dtype=np.float64)[keep]
+    toks = [toks[i] for i in keep]
+
+    # Fragment id per word: (block_no, line_no) numbered in first-seen order
+    _, first, inv = np.unique(arr[:, 3:5], axis=0, return_index=True, return_inverse=True)
+    gid = np.argsort(np.argsort(first))[inv.ravel()]
+
+    # Group words by fragment, x0-ordered inside each fragment
+    order = np.lexsort((arr[:, 0], gid))
+    starts = np.flatnonzero(np.r_[True, gid[order][1:] != gid[order][:-1]])
+    geom = np.empty(len(starts), dtype=FRAG_DTYPE)
+    geom["x0"] = np.minimum.reduceat(arr[order, 0], starts)
+    y0 = np.minimum.reduceat(arr[order, 1], starts)
+    y1 = np.maximum.reduceat(arr[order, 2], starts)
+    geom["ymid"] = (y0 + y1) / 2.0
+
+    toks = [toks[k] for k in order]
+    ends = list(starts[1:]) + [len(toks)]
+    return geom, [toks[i:j] for i, j in zip(starts, ends)]
+
+def cluster_by_y(geom, tokens, y_tol=2.0):
+    """
+    Cluster fragments (build_fragments output) into rows by ymid; within each row keep tokens
+    ordered by x0. A row starts at its lowest-ymid fragment and takes every fragment within
+    y_tol of it.
+    Returns (row_ys, row_tokens): row_ys is a float array of row y-mids in ascending order and
+    row_tokens[i] holds row i's tokens.
+    """
+    if not len(geom):
+        return np.empty(0), []
+    order = np.lexsort((geom["x0"], geom["ymid"]))  # by (ymid, x0), stable
+    ys = geom["ymid"][order]
+
+    # Row boundaries: one binary search per row instead of a Python compare per fragment. The
+    # search key anchor + y_tol is rounded, so the boundary is then nudged until it agrees with
+    # the exact membership test ys[j] - anchor <= y_tol (e.g. 65.93990865303195 - 63.93990865303194
+    # is 2.000000000000007, outside the row, yet below the rounded key)
+    bounds = [0]
+    n = len(ys)
+    while bounds[-1] < n:
+        anchor = ys[bounds[-1]]
+        j = int(np.searchsorted(ys, anchor + y_tol, side="right"))
+        while j > bounds[-1] + 1 and ys[j - 1] - anchor > y_tol:
+            j -= 1
+        while j < n and ys[j] - anchor <= y_tol:
+            j += 1
+        bounds.append(j)
+
+    # Re-order by x0 inside each row with one stable lexsort over (row id, x0)
+    row_id = np.repeat(np.arange(len(bounds) - 1), np.diff(bounds))
+    order = order[np.lexsort((geom["x0"][order], row_id))]
+
+    ym = geom["ymid"][order].tolist()
+    order = order.tolist()
+    row_ys = np.array([sum(ym[a:b]) / (b - a) for a, b in zip(bounds, bounds[1:])])
+    row_tokens = [[t for k in order[a:b] for t in tokens[k]] for a, b in zip(bounds, bounds[1:])]
+    return row_ys, row_tokens
+
+def raw_row(tokens):
+    """Debug rendering of a clustered row; built only for the few rows that get printed."""
+    return " | ".join(tokens[:35])
+
+def nearest_rows(ys, targets):
     """
-    line_map = {}
-    for w in words:
-        x0, y0, x1, y1, txt, block_no, line_no, word_no = w
-        txt = normalize_token(str(txt))
-        if not txt:
+    For each target y: index of the closest value in the sorted array `ys` and its distance.
+    Ties go to the lower index.
+    """
+    idx = np.searchsorted(ys, targets)
+    left = np.maximum(idx - 1, 0)
+    right = np.minimum(idx, len(ys) - 1)
+    k = np.where(np.abs(ys[left] - targets) <= np.abs(ys[right] - targets), left, right)
+    # first of several rows sharing that y
+    k = np.searchsorted(ys, ys[k])
+    return k, np.abs(ys[k] - targets)
+
+def source_digest(pdf_path: str) -> str:
+    """sha256 over the PDF and this extractor's source (a parser change must re-extract too)."""
+    h = hashlib.sha256(Path(pdf_path).read_bytes())
+    h.update(Path(__file__).read_bytes())
+    return h.hexdigest()
+
+# Set per pool worker by _init_worker; lives exactly as long as the worker process
+_worker_doc = None
+
+def _init_worker(pdf_path: str):
+    """Pool initializer: each worker opens the PDF once and reuses it for all its pages."""
+    global _worker_doc
+    _worker_doc = fitz.open(pdf_path)
+
+def _parse_worker_page(page_i: int):
+    return parse_page(_worker_doc, page_i)
+
+def parse_page(doc, page_i: int):
+    """
+    Parse page `page_i` of the open Document `doc` on its own, so pages can be farmed out to
+    worker processes.
+    Returns None for pages without words, else a dict with:
+      "major_group": last major-group heading on the page (None if the page has none)
+      "rows": joined (activity_id, activity_name, work_type, start, finish, start_star, finish_star) tuples
+    plus the per-page debug counters/samples. Package/major-group carry-over between pages
+    is order dependent and left to the caller.
+    """
+    page = doc[page_i]
+    words = page.get_text("words")
+    if not words:
+        return None
+
+    geom, frag_tokens = build_fragments(words)
+
+    # Major group headings (best effort), read from the same (block, line) fragments.
+    # Every prefix spans at most two words, so each line contributes only its first two tokens.
+    major_group = None
+    for m in HEADING_RE.finditer("\n".join(" ".join(toks[:2]) for toks in frag_tokens).lower()):
+        major_group = MAJOR_GROUP_PREFIXES[m.group(1)]
+
+    # Scan-only / cover / TOC pages: without a single full-date token and a single
+    # activity-id-shaped token no row can join, so skip the row clustering and id/date scans
+    # (the heading above still carries over). Page 1 always takes the full path, its first
+    # id/date rows are the debug samples printed by extract().
+    res = {
+        "major_group": major_group,
+        "rows": [],
+        "date_rows": 0,
+        "id_rows": 0,
+        "offset": None,
+        "samples": [],
+        # 🔎 TEMP DEBUG — one sample id/date row, only filled (and printed) for the first page
+        "sample_id_row": None,
+        "sample_date_row": None,
+    }
+    if page_i != 0:
+        page_tokens = [t for toks in frag_tokens for t in toks]
+        if not FULL_DATE_RE.search("\n".join(page_tokens).replace("*", "")):
+            return res
+        if not any(map(_is_act_id, page_tokens)):
+            return res
+
+    # Row clusters for whole page (this is where dates group together). Rows come out in
+    # ascending y, so the index lists below are y-sorted as well.
+    row_ys, row_tokens = cluster_by_y(geom, frag_tokens, y_tol=2.0)
+
+    # Date rows: rows that contain >=2 FULL dates (like 2026-02-15)
+    date_idx, date_hits = [], []
+    for i, toks in enumerate(row_tokens):
+        dates = extract_full_dates_from_tokens(toks)
+        if len(dates) >= 2:
+            date_idx.append(i)
+            date_hits.append(dates)
+
+    # Id rows: rows that contain an activity id; id_vals holds (activity_id, activity_name)
+    id_idx, id_vals = [], []
+    for i, toks in enumerate(row_tokens):
+        if not toks:
+            continue
+
+        # skip obvious headers, deciding on the first token wherever possible
+        first = toks[0].lower()
+        if first in HEADER_FIRST_TOKENS or first.startswith(("activity id", "activityid")):
+            continue
+        if first == "activity" and len(toks) > 1 and toks[1].lower().startswith("id"):
             continue
-        key = (block_no, line_no)
-        line_map.setdefault(key, []).append((x0, y0, x1, y1, txt))
-
-    frags = []
-    for ws in line_map.values():
-        ws = sorted(ws, key=lambda z: z[0])
-        tokens = [z[4] for z in ws if z[4]]
-        if not tokens:
+
+        # Tokens are already normalized by build_fragments
+        act_id = None
+        act_pos = None
+        for j, t in enumerate(toks[:8]):
+            if _is_act_id(t):
+                act_id = t.upper()
+                act_pos = j
+                break
+        if act_id:
+            name = " ".join(toks[act_pos + 1 :]).strip()
+            id_idx.append(i)
+            id_vals.append((act_id, name))
+
+    res["date_rows"] = len(date_idx)
+    res["id_rows"] = len(id_idx)
+    if page_i == 0:
+        res["sample_id_row"] = raw_row(row_tokens[id_idx[0]]) if id_idx else None
+        res["sample_date_row"] = raw_row(row_tokens[date_idx[0]]) if date_idx else None
+    if not date_idx or not id_idx:
+        return res
+
+    # Learn page-specific offset between date rows and id rows
+    id_ys = row_ys[id_idx]
+    date_ys = row_ys[date_idx]
+    k, dist = nearest_rows(id_ys, date_ys)
+    diffs = np.sort((id_ys[k] - date_ys)[dist < OFFSET_LEARN_MAX])
+    offset = float(diffs[len(diffs)//2]) if len(diffs) else 0.0
+    res["offset"] = offset
+
+    # Join using offset-corrected y
+    k, dist = nearest_rows(id_ys, date_ys + offset)
+    for di, (ki, d) in enumerate(zip(k.tolist(), dist.tolist())):
+        if d > Y_JOIN_MAX:
+            continue
+
+        start = date_hits[di][-2]
+        finish = date_hits[di][-1]
+
+        try:
+            start_d = parse_iso(start["iso"])
+            finish_d = parse_iso(finish["iso"])
+        except Exception:
             continue
-        y0 = min(z[1] for z in ws)
-        y1 = max(z[3] for z in ws)
-        ymid = (y0 + y1) / 2.0
-        x0 = min(z[0] for z in ws)
-        frags.append({"ymid": ymid, "x0": x0, "tokens": tokens})
-    return frags
-
-def cluster_by_y(frags, y_tol=2.0):
+
+        if finish_d < start_d:
+            continue
+
+        act_id, name = id_vals[ki]
+        if len(res["samples"]) < 8:
+            id_raw = raw_row(row_tokens[id_idx[ki]])
+            date_raw = raw_row(row_tokens[date_idx[di]])
+            res["samples"].append(f"offset={offset:.2f} ydist={d:.2f} | ID: {id_raw} || DATES: {date_raw}")
+        res["rows"].append((
+            act_id, name, infer_work_type(name), start_d, finish_d,
+            bool(start.get("star", False)), bool(finish.get("star", False)),
+        ))
+    return res
+
+def extract(pdf_path: str, out_csv: str, workers=None):
     """
-    Cluster fragments into rows by ymid; within each row keep tokens ordered by x0.
+    Extract activity rows from the schedule PDF into out_csv (+ a .parquet sibling).
+    Pages are parsed in a process pool (`workers` processes, default: one per CPU capped at 6; 1 = in-process),
+    then stitched together in page order to carry major group / package state across pages.
     """
-    frags = sorted(frags, key=lambda f: (f["ymid"], f["x0"]))
-    clusters = []
-    cur = []
-    cur_y = None
-
-    for f in frags:
-        if cur_y is None:
-            cur = [f]
-            cur_y = f["ymid"]
-        else:
-            if abs(f["ymid"] - cur_y) <= y_tol:
-                cur.append(f)
-            else:
-                clusters.append(cur)
-                cur = [f]
-                cur_y = f["ymid"]
-    if cur:
-        clusters.append(cur)
-
-    rows = []
-    for cl in clusters:
-        cl = sorted(cl, key=lambda f: f["x0"])
-        tokens = []
-        for f in cl:
-            tokens.extend(f["tokens"])
-        rows.append({"ymid": sum(f["ymid"] for f in cl) / len(cl), "tokens": tokens})
-    return rows
-
-def nearest_row(rows, y):
-    best = None
-    best_d = 1e18
-    for r in rows:
-        d = abs(r["ymid"] - y)
-        if d < best_d:
-            best_d = d
-            best = r
-    return best, best_d
-
-def extract(pdf_path: str, out_csv: str):
-    rows_out = []
+    # Parquet sits next to the CSV and is what the dashboard loads (typed columns, no date reparse)
+    out_parquet = str(Path(out_csv).with_suffix(".parquet"))
+
+    # Skip all page work when neither the PDF nor this extractor changed since the last run
+    digest = source_digest(pdf_path)
+    sha_path = Path(f"{out_csv}.sha256")
+    if (
+        sha_path.exists() and sha_path.read_text().strip() == digest
+        and Path(out_csv).exists() and Path(out_parquet).exists()
+    ):
+        print(f"[OK] {pdf_path} unchanged since last extract, keeping {out_csv}")
+        return
+
+    headers = [
+        "major_group","package_code","package_name","activity_id","activity_name","work_type",
+        "start","finish","duration_days","is_milestone","source_page","pdf_pages","start_star","finish_star"
+    ]
+    # One list per output column (filled in join order, turned into a DataFrame at the end);
+    # duration_days / is_milestone are derived from start/finish afterwards in one vectorized step
+    cols = {h: [] for h in headers if h not in ("duration_days", "is_milestone")}
     current_package_code = None
     current_package_name = None
     current_major_group = None
 
-    doc = fitz.open(pdf_path)
-    total_pages = doc.page_count
+    if workers is None:
+        # Past a handful of processes the pool is bound by PDF I/O, not CPU
+        workers = min(os.cpu_count() or 1, 6)
+
+    # The Document is scoped to this run (closed on exit here, or with the pool workers), so a
+    # later extract() in the same process always sees the current file
+    with fitz.open(pdf_path) as doc:
+        total_pages = doc.page_count
+        if workers == 1:
+            page_results = [parse_page(doc, i) for i in range(total_pages)]
+    if workers != 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pdf_path,)) as ex:
+            page_results = list(ex.map(_parse_worker_page, range(total_pages), chunksize=8))
 
     debug_date_rows = 0
     debug_id_rows = 0
     debug_offset = []
     debug_joined = 0
     debug_samples = []
+    seen = set()
 
-    for page_i in range(total_pages):
-        page = doc.load_page(page_i)
-
-        # Major group headings (best effort)
-        text = page.get_text("text") or ""
-        for ln in (text.splitlines() if text else []):
-            l = ln.strip().lower()
-            if l.startswith("detailed en"):
-                current_major_group = "Detailed Engineering Design"
-            elif l.startswith("procurement"):
-                current_major_group = "Procurement"
-            elif l.startswith("employer revi"):
-                current_major_group = "Employer Review and Approval"
-            elif l.startswith("main mile"):
-                current_major_group = "Main Milestones"
-
-        words = page.get_text("words")
-        if not words:
+    for page_i, res in enumerate(page_results):
+        if res is None:
             continue
 
-        frags = build_fragments(words)
-
-        # Row clusters for whole page (this is where dates group together)
-        y_rows = cluster_by_y(frags, y_tol=2.0)
-
-        # Build date-rows: rows that contain >=2 FULL dates (like 2026-02-15)
-        date_rows = []
-        for r in y_rows:
-            dates = extract_full_dates_from_tokens(r["tokens"])
-            if len(dates) >= 2:
-                date_rows.append({"ymid": r["ymid"], "dates": dates, "raw": " | ".join(r["tokens"][:35])})
-        date_rows.sort(key=lambda r: r["ymid"])
-
-        # Build id-rows: rows that contain an activity id
-        id_rows = []
-        for r in y_rows:
-            toks = r["tokens"]
-            if not toks:
-                continue
-
-            # skip obvious headers
-            head = " ".join(toks[:3]).lower() if len(toks) >= 3 else " ".join(toks).lower()
-            if head.startswith("activity id") or head.startswith("activityid"):
-                continue
-            if toks and toks[0].lower() in ("month", "page"):
-                continue
-
-            act_id = None
-            act_pos = None
-            for i in range(min(8, len(toks))):
-                if looks_like_activity_id(toks[i]):
-                    act_id = normalize_token(toks[i]).upper()
-                    act_pos = i
-                    break
-            if act_id:
-                name = " ".join(normalize_token(x) for x in toks[act_pos + 1 :]).strip()
-                id_rows.append({"ymid": r["ymid"], "activity_id": act_id, "activity_name": name, "raw": " | ".join(toks[:35])})
-        id_rows.sort(key=lambda r: r["ymid"])
-
-        # 🔎 TEMP DEBUG — print one sample from first page only
         if page_i == 0:
             print("=== SAMPLE DEBUG (PAGE 1) ===")
-            if id_rows:
-                print("SAMPLE ID ROW:", id_rows[0]["raw"])
-            else:
-                print("SAMPLE ID ROW: NONE")
-
-            if date_rows:
-                print("SAMPLE DATE ROW:", date_rows[0]["raw"])
-            else:
-                print("SAMPLE DATE ROW: NONE")
+            print("SAMPLE ID ROW:", res["sample_id_row"] or "NONE")
+            print("SAMPLE DATE ROW:", res["sample_date_row"] or "NONE")
             print("=== END SAMPLE DEBUG ===")
 
-        debug_date_rows += len(date_rows)
-        debug_id_rows += len(id_rows)
-
-        if not date_rows or not id_rows:
-            continue
-
-        # Learn page-specific offset between date rows and id rows
-        diffs = []
-        for dr in date_rows:
-            nr, dist = nearest_row(id_rows, dr["ymid"])
-            if nr and dist < 20.0:
-                diffs.append(nr["ymid"] - dr["ymid"])
-        offset = sorted(diffs)[len(diffs)//2] if diffs else 0.0
-        debug_offset.append(offset)
-
-        # Join using offset-corrected y
-        Y_JOIN_MAX = 25.0
-        for dr in date_rows:
-            target_y = dr["ymid"] + offset
-            ir, dist = nearest_row(id_rows, target_y)
-            if not ir or dist > Y_JOIN_MAX:
-                continue
-
-            start = dr["dates"][-2]
-            finish = dr["dates"][-1]
-
-            try:
-                start_d = parse_iso(start["iso"])
-                finish_d = parse_iso(finish["iso"])
-            except Exception:
-                continue
-
-            duration_days = (finish_d - start_d).days
-            if duration_days < 0:
-                continue
-
-            act_id = ir["activity_id"]
-            name = ir["activity_name"]
+        if res["major_group"]:
+            current_major_group = res["major_group"]
+        debug_date_rows += res["date_rows"]
+        debug_id_rows += res["id_rows"]
+        if res["offset"] is not None:
+            debug_offset.append(res["offset"])
+        debug_samples.extend(res["samples"][: 8 - len(debug_samples)])
 
+        for act_id, name, work_type, start_d, finish_d, start_star, finish_star in res["rows"]:
             if is_package_code(act_id):
                 current_package_code = act_id
                 current_package_name = name
 
             debug_joined += 1
-            if len(debug_samples) < 8:
-                debug_samples.append(
-                    f"offset={offset:.2f} ydist={dist:.2f} | ID: {ir['raw']} || DATES: {dr['raw']}"
-                )
-
-            rows_out.append({
-                "major_group": current_major_group or "Unknown",
-                "package_code": current_package_code,
-                "package_name": current_package_name,
-                "activity_id": act_id,
-                "activity_name": name,
-                "work_type": infer_work_type(name),
-                "start": start_d.isoformat(),
-                "finish": finish_d.isoformat(),
-                "duration_days": duration_days,
-                "is_milestone": start_d == finish_d,
-                "source_page": page_i + 1,
-                "pdf_pages": total_pages,
-                "start_star": bool(start.get("star", False)),
-                "finish_star": bool(finish.get("star", False)),
-            })
+            # First occurrence of an (activity_id, start, finish) wins; package state above is
+            # still updated from duplicates, as it was with the old post-hoc drop_duplicates
+            key = (act_id, start_d, finish_d)
+            if key in seen:
+                continue
+            seen.add(key)
+            cols["major_group"].append(current_major_group or "Unknown")
+            cols["package_code"].append(current_package_code)
+            cols["package_name"].append(current_package_name)
+            cols["activity_id"].append(act_id)
+            cols["activity_name"].append(name)
+            cols["work_type"].append(work_type)
+            cols["start"].append(start_d)
+            cols["finish"].append(finish_d)
+            cols["source_page"].append(page_i + 1)
+            cols["pdf_pages"].append(total_pages)
+            cols["start_star"].append(start_star)
+            cols["finish_star"].append(finish_star)
 
     print(f"[DEBUG] PDF pages: {total_pages}")
     print(f"[DEBUG] Date rows found (clustered): {debug_date_rows}")
@@ -299,22 +467,26 @@ def extract(pdf_path: str, out_csv: str):
     for s in debug_samples:
         print("   ", s)
 
-    headers = [
-        "major_group","package_code","package_name","activity_id","activity_name","work_type",
-        "start","finish","duration_days","is_milestone","source_page","pdf_pages","start_star","finish_star"
-    ]
     Path(out_csv).parent.mkdir(parents=True, exist_ok=True)
 
-    df = pd.DataFrame(rows_out)
-    if df.empty:
-        print("[WARN] No rows extracted. Writing empty CSV with headers.")
-        pd.DataFrame(columns=headers).to_csv(out_csv, index=False)
-        return
+    if not cols["activity_id"]:
+        print("[WARN] No rows extracted. Writing empty CSV/Parquet with headers.")
+        df = pd.DataFrame(columns=headers).astype({"start": "datetime64[ns]", "finish": "datetime64[ns]"})
+    else:
+        # Dates go in as typed datetime64 arrays rather than per-row ISO strings
+        cols["start"] = np.array(cols["start"], dtype="datetime64[D]")
+        cols["finish"] = np.array(cols["finish"], dtype="datetime64[D]")
+        df = pd.DataFrame(cols)
+        df["duration_days"] = (df["finish"] - df["start"]).dt.days
+        df["is_milestone"] = df["duration_days"].eq(0)
+        df = df[headers]
+        df = df.sort_values(["package_code","start","finish","activity_id"], na_position="last", ignore_index=True)
 
-    df = df.drop_duplicates(subset=["activity_id","start","finish"])
-    df = df.sort_values(["package_code","start","finish","activity_id"], na_position="last").reset_index(drop=True)
     df.to_csv(out_csv, index=False)
-    print(f"[OK] Saved {len(df)} rows → {out_csv}")
+    df.to_parquet(out_parquet, index=False)
+    sha_path.write_text(digest + "\n")
+    if not df.empty:
+        print(f"[OK] Saved {len(df)} rows → {out_csv}, {out_parquet}")
 
 if __name__ == "__main__":
     extract("ProjectSchedule.pdf", "data/primavera.csv")
@@ -0,0 +1,48 @@
+import unittest
+
+import extract_pdf
+
+
+class _Page:
+    """Just enough of a fitz.Page for parse_page: a fixed get_text("words") result."""
+
+    def __init__(self, words):
+        self._words = words
+
+    def get_text(self, mode):
+        assert mode == "words"
+        return self._words
+
+
+def _line(text, y, block):
+    """Word tuples (x0, y0, x1, y1, text, block_no, line_no, word_no) for one text line."""
+    return [
+        (10.0 + 60.0 * i, y, 60.0 + 60.0 * i, y + 10.0, w, block, 0, i)
+        for i, w in enumerate(text.split())
+    ]
+
+
+def _major_group(*lines):
+    words = []
+    for i, text in enumerate(lines):
+        words += _line(text, 20.0 * (i + 1), i)
+    return extract_pdf.parse_page([_Page(words)], 0)["major_group"]
+
+
+class MajorGroupHeadingTest(unittest.TestCase):
+    def test_plain_headings(self):
+        self.assertEqual(_major_group("PROCUREMENT"), "Procurement")
+        self.assertEqual(_major_group("Main Milestones", "Detailed Engineering"), "Detailed Engineering Design")
+
+    def test_dotted_capital_i(self):
+        # "İ".lower() is "i" + combining dot, which still starts with "employer revi"
+        self.assertEqual(_major_group("EMPLOYER REVİEW AND APPROVAL"), "Employer Review and Approval")
+
+    def test_dotless_i(self):
+        # "ı" is not "i": no heading, and no KeyError
+        self.assertIsNone(_major_group("Detaıled Engineering"))
+        self.assertEqual(_major_group("Procurement", "Detaıled Engineering"), "Procurement")
+
+
+if __name__ == "__main__":
+    unittest.main()